@@ -1,15 +1,43 @@
 import numpy as np
-import itertools
 import pandas as pd
 import pathlib as pl
 import pickle
 import json
 import shutil
+import sys
+import time
 from datetime import datetime
 import os
 
 from pasty import slurm_interface as si
 from pasty import images_to_latex as itl
+from pasty import resource_model as rm
+
+def get_default_config(base_path):
+    """
+    Returns default configuration of a study in 'base_path'.
+    """
+    config =   {'base_dir'     : base_path,
+                'name'         : 'parametric_study',
+                'sim_dir'      : 'simulations',
+                'analysis_dir' : 'analysis',
+                'jobs_dir'     : 'slurm_jobs',
+                'exp_name_pre' : 'sim',
+                'exp_name_post': None,
+                'id_format'    : '%03d',
+                'param_file_name' : 'params.py',
+                'template_source_folder' : None,
+                'template_target_folder' : 'all',
+                'results_file_name' : os.path.join('summary', 'simulation_parameterset_summary.pkl'),
+                'results_table_file_name': 'results_summary',
+                'parameter_table_file_name': 'parameter_summary',
+                'jobs_table_file_name': 'slurm_jobs_summary',
+                'job_tasks_table_file_name': 'slurm_job_tasks_summary',
+                'summary_doc_dir' : "summary_doc",
+                'mem_per_cpu' : '5G',
+                'parameter_dtype' : None}
+    return config
+
 
 class ParametricStudy():
 
@@ -24,24 +52,16 @@ class ParametricStudy():
                             "param_3": {'range' : [0,10], "stepsize" : 4}}
 
             possible specifications: {range, steps}, {range, stepsize}, [list]
+
+        (2) config
+
+            'parameter_dtype' selects storage of numeric parameter columns: None (float64, integer
+            parameters keep their integer type), 'float64' or 'category'. Non-numeric parameters are
+            always stored as categoricals. Values are never stored with reduced precision, as parameter
+            files are written from this table.
         """
         self.base_dir = base_path
-        self.config =   {'base_dir'     : base_path,
-                         'name'         : 'parametric_study',
-                         'sim_dir'      : 'simulations',
-                         'analysis_dir' : 'analysis',
-                         'jobs_dir'     : 'slurm_jobs',
-                         'exp_name_pre' : 'sim',
-                         'exp_name_post': None,
-                         'id_format'    : '%03d',
-                         'param_file_name' : 'params.py',
-                         'template_source_folder' : None,
-                         'template_target_folder' : 'all',
-                         'results_file_name' : os.path.join('summary', 'simulation_parameterset_summary.pkl'),
-                         'results_table_file_name': 'results_summary',
-                         'parameter_table_file_name': 'parameter_summary',
-                         'jobs_table_file_name': 'slurm_jobs_summary',
-                         'summary_doc_dir' : "summary_doc"}
+        self.config = get_default_config(base_path)
 
         self.path_to_state_file = pl.Path(base_path).joinpath('experiment_state.pkl')
 
@@ -61,8 +81,16 @@ class ParametricStudy():
                       'parameter_table' : self.parameter_table}
         if hasattr(self, 'results_table'):
             state_dict['results_table'] = self.results_table
+        if hasattr(self, 'results_file_mtimes'):
+            state_dict['results_file_mtimes'] = self.results_file_mtimes
         if hasattr(self, 'job_table'):
             state_dict['job_table'] = self.job_table
+        if hasattr(self, 'job_task_table'):
+            state_dict['job_task_table'] = self.job_task_table
+        if hasattr(self, 'retry_counts'):
+            state_dict['retry_counts'] = self.retry_counts
+        if hasattr(self, 'resubmitted_tasks'):
+            state_dict['resubmitted_tasks'] = self.resubmitted_tasks
         with self.path_to_state_file.open(mode='wb') as handle:
             pickle.dump(state_dict, handle, protocol=pickle.HIGHEST_PROTOCOL)
         print("-- Saved current state to '%s'"%self.path_to_state_file)
@@ -70,8 +98,16 @@ class ParametricStudy():
     def reload_state(self):
         if self.path_to_state_file.exists():
             state_dict = pickle.load(self.path_to_state_file.open(mode='rb'))
+            # keep defaults for config entries missing in states saved by earlier versions
+            self.config.update(state_dict.pop('config'))
             for name, item in state_dict.items():
                 setattr(self, name, item)
+            self.parameter_table = self._compact_parameter_table(self.parameter_table)
+            if hasattr(self, 'job_table'):
+                self.job_table = self._compact_job_table(self.job_table)
+            if hasattr(self, 'results_table'):
+                # simulation names are derived from exp_id, see 'get_sim_name'
+                self.results_table = self.results_table.drop('sim_name', axis=1, errors='ignore')
             print("-- Reloaded statem from '%s'."%self.path_to_state_file)
         else:
             print("-- Statefile does not exist. Cannot reload")
@@ -103,13 +139,10 @@ class ParametricStudy():
         return values
 
     def create_parameter_table(self):
-        param_names = self.problem.keys()
+        param_names = list(self.problem.keys())
         param_values= [ param_dict['values'] for param_dict in self.problem.values()]
 
-        cart_prod_values = itertools.product(*param_values)
-        param_df = pd.DataFrame(columns=param_names)
-        for i, vars in enumerate(cart_prod_values):
-            param_df.loc[i] = vars
+        param_df = self._create_parameter_dataframe(param_names, param_values)
         self.parameter_table = param_df
         # -- save
         p_analysis = self.create_analysis_dir_path()
@@ -117,6 +150,79 @@ class ParametricStudy():
         self.save_table(param_df, p_parameter_summary_file)
         return param_df
 
+    def _create_parameter_dataframe(self, param_names, params_values):
+        """
+        Creates table of all parameter combinations (cartesian product), one row per exp_id.
+        Columns are assembled from the index of each value in its parameter's values, so that no
+        intermediate object rows are created.
+        """
+        params_values = [np.asarray(values) for values in params_values]
+        shape = [len(values) for values in params_values]
+        n_combinations = int(np.prod(shape))
+        codes = np.unravel_index(np.arange(n_combinations), shape)
+        columns = {}
+        for name, values, values_codes in zip(param_names, params_values, codes):
+            if self._use_categorical(values) and len(np.unique(values)) == len(values):
+                columns[name] = pd.Categorical.from_codes(values_codes, categories=values)
+            else:
+                columns[name] = values[values_codes]
+        param_df = pd.DataFrame(columns, columns=param_names)
+        return self._compact_parameter_table(param_df)
+
+    def _use_categorical(self, values):
+        return self.config['parameter_dtype'] == 'category' or not pd.api.types.is_numeric_dtype(values)
+
+    def _compact_parameter_table(self, param_df):
+        """
+        Converts parameter columns to compact dtypes, see config 'parameter_dtype'.
+        Simulation paths are derived from exp_id and not stored in the table.
+        """
+        param_df = param_df.drop('simulation_path', axis=1, errors='ignore')
+        for name in self.problem.keys():
+            if name not in param_df.columns or isinstance(param_df[name].dtype, pd.CategoricalDtype):
+                continue
+            try:
+                values = pd.to_numeric(param_df[name])
+            except (ValueError, TypeError):
+                values = param_df[name]
+            if self._use_categorical(values):
+                param_df[name] = values.astype('category')
+            elif pd.api.types.is_integer_dtype(values) and self.config['parameter_dtype'] is None:
+                param_df[name] = values
+            else:
+                param_df[name] = values.astype('float64')
+        return param_df
+
+    def _compact_job_table(self, job_df):
+        """
+        Stores job ids as strings and job files by their name, relative to the jobs directory.
+        """
+        job_df = job_df.copy()
+        if 'job_id' in job_df.columns:
+            job_df['job_id'] = [job_id.decode() if isinstance(job_id, bytes) else str(job_id)
+                                for job_id in job_df.job_id]
+        if 'job_file' in job_df.columns:
+            job_df['job_file'] = [pl.Path(job_file).name for job_file in job_df.job_file]
+        return job_df
+
+    def memory_report(self, deep=True):
+        """
+        Returns number of rows and memory usage (MB) of the tables held by this study.
+        """
+        report = {}
+        for name in ['parameter_table', 'results_table', 'job_table', 'job_task_table']:
+            if hasattr(self, name):
+                table = getattr(self, name)
+                report[name] = {'n_rows': len(table),
+                                'n_columns': len(table.columns),
+                                'memory_mb': table.memory_usage(index=True, deep=deep).sum() / 1024. ** 2}
+        if hasattr(self, 'results_file_mtimes'):
+            report['results_file_mtimes'] = {'n_rows': len(self.results_file_mtimes), 'n_columns': 1,
+                                             'memory_mb': self.results_file_mtimes.memory_usage(index=True, deep=deep)
+                                                          / 1024. ** 2}
+        report_df = pd.DataFrame.from_dict(report, orient='index', columns=['n_rows', 'n_columns', 'memory_mb'])
+        return report_df
+
     def create_path(self, exp_id=None, path_type='simulation', create=False, exist_ok=False):
         if path_type == 'simulation':
             subpath = self.config['sim_dir']
@@ -155,8 +261,6 @@ class ParametricStudy():
                 p = self.create_path(exp_id=idx, path_type='simulation', create=True, exist_ok=exist_ok)
                 if verbose:
                     print("  - ID %03d: Creating folder '%s'"%(idx, p))
-                # add path to parameter_table
-                self.parameter_table.loc[idx,'simulation_path'] = p.as_posix()
                 # write parameter files
                 if with_param_files:
                     path_param_json = p.joinpath(self.config['param_file_name'])
@@ -177,7 +281,8 @@ class ParametricStudy():
 
 
     def get_parameters(self, exp_id):
-        params = self.parameter_table.loc[exp_id, self.problem.keys()]
+        # keep type of each parameter, rather than upcasting the row to a common dtype
+        params = self.parameter_table.loc[[exp_id], list(self.problem.keys())].astype(object).iloc[0]
         return params
 
     def write_parameter_file(self, exp_id, path):
@@ -221,12 +326,10 @@ class ParametricStudy():
         print("-- Saving table '%s'"%path_xls)
 
     def extend_study(self, param_names, params_values, generate_folders=False, overwrite=False):
-        cart_prod_values = itertools.product(*params_values)
-        param_df_new = pd.DataFrame(columns=param_names)
-        for i, vars in enumerate(cart_prod_values):
-            param_df_new.loc[i] = vars
+        param_df_new = self._create_parameter_dataframe(param_names, params_values)
         # merge existing with new
         param_df_merged = self.parameter_table.merge(param_df_new, on=param_names, how="outer", suffixes=('', '_tmp'))
+        param_df_merged = self._compact_parameter_table(param_df_merged)
         #param_df_merged = param_df_merged.drop('simulation_path_tmp', axis=1)
         # assign to self.parameter_table & save
         print("Updating parameter table")
@@ -239,38 +342,99 @@ class ParametricStudy():
             self.generate_simulation_folder_structure(exist_ok=True, verbose=True, overwrite=overwrite)
         self.save_state()
 
-    def collect_results(self, verbose=False):
-        print("-- Trying to assemble results.")
-        results_df = pd.DataFrame()
-        for idx, row in self.parameter_table.iterrows():
-            p_results_file = self.create_path_results_file(idx)
-            if p_results_file.exists():
-                if verbose:
-                    print("  - id %04d: exists"%idx)
+    def load_results(self, exp_id, verbose=False):
+        """
+        Loads results file of exp_id into DataFrame indexed by exp_id.
+        Returns DataFrame without columns if results file is missing, None if it cannot be loaded.
+        Simulation names are not stored, see 'get_sim_name'.
+        """
+        p_results_file = self.create_path_results_file(exp_id)
+        if p_results_file.exists():
+            if verbose:
+                print("  - id %04d: exists"%exp_id)
+            try:
                 try:
-                    try:
-                        results_dict = pickle.load(p_results_file.open(mode='rb'))
-                        results_dict['sim_name'] = 'sim_%04d'%idx
-                        results_series = pd.Series(results_dict, name=idx)
-                        results_df = results_df.append(results_series)
-                    except:
-                        print(p_results_file.as_posix())
-                        results_df_tmp = pd.read_pickle(p_results_file.as_posix())
-                        results_df_tmp['sim_name'] = 'sim_%04d'%idx
-                        results_df = results_df.append(results_df_tmp, ignore_index=True)
+                    results = pickle.load(p_results_file.open(mode='rb'))
                 except:
-                    print("Cannot load '%s'"%p_results_file.as_posix())
-            else:
-                if verbose:
-                    print("  - id %03d: missing (%s)" % (idx,p_results_file))
-                results_series = pd.Series(name=idx)
-                results_series['sim_name'] = 'sim_%04d'%idx
-                results_df = results_df.append(results_series)
-        self.results_table = results_df
-        #-- save
+                    print(p_results_file.as_posix())
+                    results = pd.read_pickle(p_results_file.as_posix())
+                if isinstance(results, pd.DataFrame):
+                    results_df = results.copy()
+                    results_df.index = [exp_id] * len(results_df)
+                else:
+                    results_df = pd.DataFrame([pd.Series(results, name=exp_id)])
+            except:
+                print("Cannot load '%s'"%p_results_file.as_posix())
+                results_df = None
+        else:
+            if verbose:
+                print("  - id %03d: missing (%s)" % (exp_id, p_results_file))
+            results_df = pd.DataFrame(index=[exp_id])
+        return results_df
+
+    def get_sim_name(self, exp_id):
+        return 'sim_%04d'%exp_id
+
+    def collect_results(self, verbose=False):
+        print("-- Trying to assemble results.")
+        self.results_table = pd.DataFrame()
+        self.results_file_mtimes = pd.Series(dtype=float)
+        self.update_results(verbose=verbose)
+
+    def update_results(self, verbose=False, save=True):
+        """
+        Updates 'results_table' incrementally, only (re)loading results files that are new or have been
+        modified since they were last loaded.
+        The results table is saved if it changed and 'save' is True.
+        Returns list of updated exp_ids.
+        """
+        if not hasattr(self, 'results_table') or not hasattr(self, 'results_file_mtimes'):
+            self.results_table = pd.DataFrame()
+            self.results_file_mtimes = pd.Series(dtype=float)
+        # modification time of loaded results files per exp_id; 0 if missing, NaN if not loaded
+        mtimes = self.results_file_mtimes.reindex(self.parameter_table.index).values.copy()
+        updated_ids = []
+        results_frames = []
+        for i, idx in enumerate(self.parameter_table.index):
+            try:
+                mtime = self.create_path_results_file(idx).stat().st_mtime
+            except OSError:
+                mtime = 0.
+            if mtimes[i] == mtime:
+                continue
+            results_df_tmp = self.load_results(idx, verbose=verbose)
+            if results_df_tmp is not None:
+                mtimes[i] = mtime
+                updated_ids.append(idx)
+                results_frames.append(results_df_tmp)
+        self.results_file_mtimes = pd.Series(mtimes, index=self.parameter_table.index)
+        if len(updated_ids) > 0:
+            results_df = self.results_table.drop(updated_ids, errors='ignore')
+            results_df = pd.concat([results_df] + results_frames, sort=False).sort_index()
+            self.results_table = results_df
+            if save:
+                self.save_results_table()
+        return updated_ids
+
+    def save_results_table(self):
         p_analysis = self.create_path(path_type='analysis', create=True, exist_ok=True)
         p_results_summary_file = p_analysis.joinpath(self.config['results_table_file_name'])
-        self.save_table(results_df, p_results_summary_file)
+        self.save_table(self.results_table, p_results_summary_file)
+
+    def get_exp_ids_with_results(self, results_col_name=None):
+        """
+        Returns exp_ids for which results have been loaded.
+        If 'results_col_name' is given, only exp_ids with a valid entry in this column are considered.
+        """
+        if not hasattr(self, 'results_table') or len(self.results_table) == 0:
+            return []
+        if results_col_name is None:
+            results = self.results_table.dropna(how='all')
+        elif results_col_name in self.results_table.columns:
+            results = self.results_table[self.results_table[results_col_name].notna()]
+        else:
+            return []
+        return sorted(set(results.index))
 
     def create_datetime_stamped_path(self, basepath, filename, file_ext):
         date_time_str = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
@@ -284,7 +448,8 @@ class ParametricStudy():
         params = {'VAR_SIM_BASE_DIR' : sim_dir,
                    'VAR_SLURM_ERROR_OUT': jobs_dir.joinpath('slurm_output_error.out').as_posix(),
                    'VAR_SLURM_OUT': jobs_dir.joinpath('slurm_output.out').as_posix(),
-                   'VAR_SUBMISSION_NAME': self.config['name']}
+                   'VAR_SUBMISSION_NAME': self.config['name'],
+                   'VAR_MEM_PER_CPU': self.config['mem_per_cpu']}
         if job_params is not None:
             params.update(job_params)
         # create job file
@@ -293,10 +458,10 @@ class ParametricStudy():
         # submit job
         job_id = si.submit_job(p_job_file.as_posix(), ['submit', 'ppx'])
         # append to job submission dict
-        submission_dict = {'submission_time' : datetime.now(), 'job_file' : p_job_file, 'job_id' : job_id}
+        submission_dict = {'submission_time' : datetime.now(), 'job_file' : p_job_file.name, 'job_id' : job_id}
         if not hasattr(self, 'job_table'):
             self.job_table = pd.DataFrame()
-        self.job_table = self.job_table.append(submission_dict, ignore_index=True)
+        self.job_table = pd.concat([self.job_table, pd.DataFrame([submission_dict])], ignore_index=True)
         p_jobs_file = jobs_dir.joinpath(self.config['jobs_table_file_name'])
         self.save_table(self.job_table, p_jobs_file)
         return job_id
@@ -327,9 +492,7 @@ class ParametricStudy():
                 no_results = results[results[results_col_name].isna()]
             else:
                 no_results = results
-            unique_sim_names = no_results.sim_name.unique()
-            indices = [int(sim_name.split('_')[1]) for sim_name in unique_sim_names]
-            #indices = [str(index) for index in no_results.index]
+            indices = sorted(set(no_results.index))
             if len(indices)==0:
                 print("Nothing to submit")
                 job_id = None
@@ -341,12 +504,288 @@ class ParametricStudy():
                     else:
                         batch = indices
                         indices = []
-                    array_range = ",".join(batch)
+                    array_range = si.indices_to_array_range(batch)
                     job_id = self.submit_array_job(path_to_template, job_params, array_range=array_range, n_concurrent=n_concurrent)
         else:
             job_id = self.submit_array_job(path_to_template, job_params, array_range='all', n_concurrent=n_concurrent)
         return job_id
 
+    def collect_job_accounting(self, job_ids=None, verbose=False, save=True):
+        """
+        Queries slurm accounting for all jobs in job_table, or only for 'job_ids', and assembles per-task
+        state, elapsed time (seconds) and MaxRSS (MB) in 'job_task_table'.
+        Entries of jobs that are not queried are kept.
+        In 'job_table', jobs are marked 'finished' once their job-level entry or all of their tasks have
+        reached a final state; 'n_unaccounted' counts queries without any accounting entry for the job.
+        The job task table is saved if task states changed and 'save' is True.
+        Returns True if task states changed.
+        """
+        print("-- Trying to assemble job accounting information.")
+        if not hasattr(self, 'job_table'):
+            print("No jobs have been submitted")
+            return False
+        if job_ids is None:
+            job_ids = self.get_job_ids()
+        if len(job_ids) == 0:
+            print("No valid job ids to query")
+            return False
+        accounting = si.check_jobs_past(job_ids=job_ids, format_fields=['JobID', 'State', 'Elapsed', 'MaxRSS'])
+        if accounting is None:
+            return False
+        tasks_dict = {}
+        job_states = {}
+        for idx, row in accounting.iterrows():
+            job_id, task_ids, step = si.parse_array_job_id(row['jobid'])
+            job_id = sys.intern(job_id)
+            if len(task_ids) == 0 and step == '':
+                job_states[job_id] = row['state'].split()[0]
+            for task_id in task_ids:
+                task_dict = tasks_dict.setdefault((job_id, task_id), {'job_id': job_id, 'exp_id': task_id,
+                                                                      'state': None, 'elapsed_s': np.nan,
+                                                                      'max_rss_mb': np.nan})
+                if step == '':
+                    task_dict['state'] = sys.intern(row['state'].split()[0])
+                    task_dict['elapsed_s'] = si.slurm_time_to_seconds(row['elapsed'])
+                max_rss_mb = si.slurm_memory_to_mb(row['maxrss'])
+                if not np.isnan(max_rss_mb):
+                    task_dict['max_rss_mb'] = np.nanmax([task_dict['max_rss_mb'], max_rss_mb])
+        task_df = pd.DataFrame(list(tasks_dict.values()),
+                               columns=['job_id', 'exp_id', 'state', 'elapsed_s', 'max_rss_mb'])
+        self._update_job_table_states(job_ids, job_states, task_df)
+        task_df_before = getattr(self, 'job_task_table', None)
+        if task_df_before is not None:
+            job_ids_updated = set(job_ids) | set(task_df.job_id)
+            task_df_kept = task_df_before[~task_df_before.job_id.isin(job_ids_updated)]
+            task_df = pd.concat([task_df_kept, task_df], ignore_index=True)
+        if verbose:
+            print(task_df)
+        self.job_task_table = task_df
+        state_cols = ['job_id', 'exp_id', 'state']
+        states_changed = task_df_before is None or not task_df_before[state_cols].equals(task_df[state_cols])
+        if save and states_changed:
+            self.save_job_task_table()
+        return states_changed
+
+    def save_job_task_table(self):
+        jobs_dir = self.create_path(path_type='jobs', create=True, exist_ok=True)
+        p_job_tasks_file = jobs_dir.joinpath(self.config['job_tasks_table_file_name'])
+        self.save_table(self.job_task_table, p_job_tasks_file)
+
+    def _update_job_table_states(self, job_ids, job_states, task_df):
+        if 'finished' not in self.job_table.columns:
+            self.job_table['finished'] = False
+        if 'n_unaccounted' not in self.job_table.columns:
+            self.job_table['n_unaccounted'] = 0
+        self.job_table['finished'] = self.job_table.finished.fillna(False).astype(bool)
+        self.job_table['n_unaccounted'] = self.job_table.n_unaccounted.fillna(0).astype(int)
+        for job_id in job_ids:
+            rows = self.job_table.job_id == job_id
+            job_tasks = task_df[task_df.job_id == job_id]
+            if job_id in job_states:
+                self.job_table.loc[rows, 'finished'] = job_states[job_id] in si.final_job_states
+            elif len(job_tasks) > 0:
+                self.job_table.loc[rows, 'finished'] = bool(job_tasks.state.isin(si.final_job_states).all())
+            else:
+                self.job_table.loc[rows, 'n_unaccounted'] += 1
+
+    def get_job_ids(self, active_only=False, max_unaccounted=3):
+        """
+        Returns ids of submitted jobs as strings, excluding jobs that were not submitted to slurm.
+        If 'active_only', jobs that have finished, or for which accounting returned no entries in
+        'max_unaccounted' queries, are excluded.
+        """
+        if not hasattr(self, 'job_table'):
+            return []
+        jobs = self.job_table
+        if active_only and 'finished' in jobs.columns:
+            finished = jobs.finished.fillna(False).astype(bool)
+            unaccounted = jobs.n_unaccounted.fillna(0) >= max_unaccounted
+            jobs = jobs[~(finished | unaccounted)]
+        job_ids = [job_id for job_id in jobs.job_id if job_id.isdigit()]
+        return job_ids
+
+    def estimate_job_resources(self, exp_ids='all', failure_factor=2.):
+        """
+        Estimates elapsed time (seconds) and memory (MB) for each exp_id.
+        Observed values of completed tasks are used where available, otherwise values are predicted
+        by a log-linear model in the study parameters, fitted to completed tasks.
+        Tasks that failed by running out of time or memory are estimated at least 'failure_factor'
+        times their observed usage.
+        """
+        if not hasattr(self, 'job_task_table'):
+            self.collect_job_accounting()
+        if exp_ids == 'all':
+            exp_ids = self.parameter_table.index
+        params = self.parameter_table.loc[:, list(self.problem.keys())]
+        estimates = pd.DataFrame(index=pd.Index(exp_ids, name='exp_id'),
+                                 columns=['elapsed_s', 'max_rss_mb', 'source'])
+        tasks = getattr(self, 'job_task_table', None)
+        if tasks is None or len(tasks) == 0:
+            print("No accounting information available")
+            return estimates
+        completed = tasks[tasks.state == 'COMPLETED'].groupby('exp_id')[['elapsed_s', 'max_rss_mb']].max()
+        for resource in ['elapsed_s', 'max_rss_mb']:
+            model = rm.fit_log_linear_model(params, completed[resource])
+            if model is not None:
+                estimates[resource] = rm.predict_log_linear_model(model, params.loc[exp_ids])
+                estimates['source'] = 'model'
+        observed = completed.reindex(estimates.index).dropna(how='all')
+        estimates.loc[observed.index, ['elapsed_s', 'max_rss_mb']] = observed.values
+        estimates.loc[observed.index, 'source'] = 'observed'
+        # -- lower bounds from tasks that exceeded their limits
+        for state, resource in [('TIMEOUT', 'elapsed_s'), ('OUT_OF_MEMORY', 'max_rss_mb')]:
+            failed = tasks[tasks.state == state].groupby('exp_id')[resource].max() * failure_factor
+            failed = failed.reindex(estimates.index).dropna()
+            estimates.loc[failed.index, resource] = np.fmax(estimates.loc[failed.index, resource].astype(float),
+                                                            failed)
+        return estimates
+
+    def submit_array_job_by_resources(self, path_to_template, job_params=None, exp_ids='all', n_groups=3,
+                                      safety_factor=1.5, min_time=600, max_time=None, min_mem=1024,
+                                      n_concurrent=None, batch_size=100):
+        """
+        Submits exp_ids as separate array jobs, grouped by estimated resource demand.
+        Time (VAR_MAX_CPU_TIME) and memory (VAR_MEM_PER_CPU) requests of each group are set to the
+        largest estimate in the group, multiplied by 'safety_factor'.
+        Times 'min_time' and 'max_time' are given in seconds, memory 'min_mem' in MB.
+        Groups without memory estimate use config 'mem_per_cpu'.
+        If no estimates are available, all exp_ids are submitted with 'job_params'.
+        """
+        estimates = self.estimate_job_resources(exp_ids=exp_ids)
+        if estimates.elapsed_s.isna().all():
+            print("Cannot estimate resources, submitting with given job parameters")
+            indices = list(estimates.index)
+            job_ids = []
+            for i in range(0, len(indices), batch_size):
+                array_range = si.indices_to_array_range(indices[i:i + batch_size])
+                job_ids.append(self.submit_array_job(path_to_template, job_params, array_range=array_range,
+                                                     n_concurrent=n_concurrent))
+            return job_ids
+        # use most conservative estimate for exp_ids without estimate
+        estimates['elapsed_s'] = estimates.elapsed_s.astype(float).fillna(estimates.elapsed_s.max())
+        estimates['max_rss_mb'] = estimates.max_rss_mb.astype(float).fillna(estimates.max_rss_mb.max())
+        job_ids = []
+        for group in rm.group_by_resources(estimates, n_groups=n_groups):
+            time_s = max(group.elapsed_s.max() * safety_factor, min_time)
+            if max_time is not None:
+                time_s = min(time_s, max_time)
+            group_params = {'VAR_MAX_CPU_TIME': si.seconds_to_slurm_time(time_s)}
+            if not np.isnan(group.max_rss_mb.max()):
+                mem_mb = max(group.max_rss_mb.max() * safety_factor, min_mem)
+                group_params['VAR_MEM_PER_CPU'] = si.mb_to_slurm_memory(mem_mb)
+            if job_params is not None:
+                group_params.update({name: value for name, value in job_params.items()
+                                     if name not in group_params.keys()})
+            indices = list(group.index)
+            print("-- Submitting %i tasks with time '%s'" % (len(indices), group_params['VAR_MAX_CPU_TIME']))
+            for i in range(0, len(indices), batch_size):
+                array_range = si.indices_to_array_range(indices[i:i + batch_size])
+                job_id = self.submit_array_job(path_to_template, group_params, array_range=array_range,
+                                               n_concurrent=n_concurrent)
+                job_ids.append(job_id)
+        return job_ids
+
+    def get_exp_ids_to_resubmit(self, max_retries=2, results_col_name=None, resubmit_cancelled=False):
+        """
+        Returns exp_ids without results whose most recent task has failed, and that have been
+        resubmitted less than 'max_retries' times.
+        Tasks that have already been resubmitted after this failure are excluded until a task of the new
+        submission shows up in accounting. Cancelled tasks are only included if 'resubmit_cancelled'.
+        """
+        if not hasattr(self, 'job_task_table') or len(self.job_task_table) == 0:
+            return []
+        if not hasattr(self, 'retry_counts'):
+            self.retry_counts = {}
+        if not hasattr(self, 'resubmitted_tasks'):
+            self.resubmitted_tasks = {}
+        failed_states = si.failed_job_states + (['CANCELLED'] if resubmit_cancelled else [])
+        latest_tasks = self._get_latest_tasks()
+        failed_tasks = latest_tasks[latest_tasks.state.isin(failed_states)]
+        exp_ids_with_results = self.get_exp_ids_with_results(results_col_name)
+        exp_ids = [int(exp_id) for exp_id, job_id in failed_tasks.job_id.items()
+                   if exp_id not in exp_ids_with_results
+                   and self.retry_counts.get(exp_id, 0) < max_retries
+                   and self.resubmitted_tasks.get(exp_id) != job_id]
+        return exp_ids
+
+    def _get_latest_tasks(self):
+        """
+        Returns entry of the most recent job for each exp_id in 'job_task_table', indexed by exp_id.
+        Entries are taken as whole rows, so that state and job_id always belong to the same job.
+        """
+        tasks = self.job_task_table.copy()
+        tasks['job_id_int'] = tasks.job_id.astype(int)
+        return tasks.sort_values(by='job_id_int').groupby('exp_id').tail(1).set_index('exp_id')
+
+    def watch(self, path_to_template, job_params=None, poll_interval=300, max_retries=2, n_concurrent=None,
+              results_col_name=None, batch_size=100, max_polls=None, max_unaccounted=3,
+              resubmit_cancelled=False, checkpoint_interval=1800, save_tables=False, verbose=False,
+              **resource_kwargs):
+        """
+        Supervises a running study until all results are available or no jobs remain active:
+        Results and job states are updated incrementally every 'poll_interval' seconds, and failed tasks
+        are resubmitted up to 'max_retries' times.
+        Resubmissions are sized by 'submit_array_job_by_resources' (which accepts 'resource_kwargs'), so
+        tasks that ran out of time or memory request more.
+        Jobs without accounting entries in 'max_unaccounted' polls are considered inactive.
+        The state is saved after resubmissions, and otherwise at most every 'checkpoint_interval' seconds
+        if it changed. Results and job task tables are written when watching ends, or on every poll
+        with changes if 'save_tables'.
+        """
+        print("-- Watching study in '%s'" % self.base_dir)
+        if not hasattr(self, 'retry_counts'):
+            self.retry_counts = {}
+        if not hasattr(self, 'resubmitted_tasks'):
+            self.resubmitted_tasks = {}
+        n_polls = 0
+        time_checkpoint = time.time()
+        unsaved_changes = False
+        try:
+            while True:
+                n_polls += 1
+                updated_ids = self.update_results(verbose=verbose, save=save_tables)
+                active_job_ids = self.get_job_ids(active_only=True, max_unaccounted=max_unaccounted)
+                states_changed = False
+                if len(active_job_ids) > 0:
+                    states_changed = self.collect_job_accounting(job_ids=active_job_ids, verbose=verbose,
+                                                                 save=save_tables)
+                resubmit_ids = self.get_exp_ids_to_resubmit(max_retries=max_retries,
+                                                            results_col_name=results_col_name,
+                                                            resubmit_cancelled=resubmit_cancelled)
+                if len(resubmit_ids) > 0:
+                    failed_job_ids = self._get_latest_tasks().job_id
+                    self.submit_array_job_by_resources(path_to_template, job_params, exp_ids=resubmit_ids,
+                                                       n_concurrent=n_concurrent, batch_size=batch_size,
+                                                       **resource_kwargs)
+                    for exp_id in resubmit_ids:
+                        self.retry_counts[exp_id] = self.retry_counts.get(exp_id, 0) + 1
+                        self.resubmitted_tasks[exp_id] = failed_job_ids[exp_id]
+                n_results = len(self.get_exp_ids_with_results(results_col_name))
+                n_total = len(self.parameter_table)
+                print("-- Poll %i: %i/%i results, %i updated, %i active jobs, %i tasks resubmitted"
+                      % (n_polls, n_results, n_total, len(updated_ids), len(active_job_ids), len(resubmit_ids)))
+                unsaved_changes = unsaved_changes or len(updated_ids) > 0 or states_changed
+                if len(resubmit_ids) > 0 or (unsaved_changes and time.time() - time_checkpoint >= checkpoint_interval):
+                    self.save_state()
+                    time_checkpoint = time.time()
+                    unsaved_changes = False
+                if n_results == n_total:
+                    print("-- All results available")
+                    break
+                if len(self.get_job_ids(active_only=True, max_unaccounted=max_unaccounted)) == 0 \
+                        and len(resubmit_ids) == 0:
+                    print("-- No active jobs remaining, %i results missing" % (n_total - n_results))
+                    break
+                if max_polls is not None and n_polls >= max_polls:
+                    break
+                time.sleep(poll_interval)
+        finally:
+            if hasattr(self, 'results_table'):
+                self.save_results_table()
+            if hasattr(self, 'job_task_table'):
+                self.save_job_task_table()
+            self.save_state()
+
     def latex_experiment_summary(self, doc, exp_id, results):
         doc.addLine("%========================================== \n")
         doc.addLine("\\begin{frame} \n")
@@ -0,0 +1,60 @@
+"""Simple models for estimating job resources (runtime, memory) from study parameters"""
+
+import numpy as np
+import pandas as pd
+
+
+def numeric_parameter_columns(param_df):
+    """
+    Returns parameter table restricted to columns that can be interpreted as numbers.
+    """
+    numeric_df = param_df.apply(pd.to_numeric, errors='coerce')
+    numeric_df = numeric_df.dropna(axis=1, how='all').astype(float)
+    return numeric_df
+
+def fit_log_linear_model(param_df, values):
+    """
+    Fits log(values) = c_0 + sum_i c_i * param_i by least squares.
+    'param_df' and 'values' are expected to share the same index.
+    Returns None if there are no valid observations.
+    """
+    values = pd.Series(values, dtype=float)
+    values = values[values > 0].dropna()
+    if len(values) == 0:
+        return None
+    X_df = numeric_parameter_columns(param_df.loc[values.index])
+    X_df = X_df.fillna(X_df.mean())
+    X = np.hstack([np.ones((len(X_df), 1)), X_df.values])
+    coefficients, _, _, _ = np.linalg.lstsq(X, np.log(values.values), rcond=None)
+    model = {'columns': list(X_df.columns),
+             'coefficients': coefficients,
+             'mean': X_df.mean(),
+             'min_value': values.min(),
+             'max_value': values.max(),
+             'n_observations': len(values)}
+    return model
+
+def predict_log_linear_model(model, param_df, extrapolation_factor=2.):
+    """
+    Predicts values for all rows of 'param_df'.
+    Predictions are limited to 'extrapolation_factor' times the range of observed values.
+    """
+    X_df = numeric_parameter_columns(param_df).reindex(columns=model['columns'])
+    X_df = X_df.fillna(model['mean'])
+    X = np.hstack([np.ones((len(X_df), 1)), X_df.values])
+    prediction = np.exp(X.dot(model['coefficients']))
+    prediction = np.clip(prediction, model['min_value'] / extrapolation_factor,
+                                     model['max_value'] * extrapolation_factor)
+    return pd.Series(prediction, index=param_df.index)
+
+def group_by_resources(estimates, n_groups=3, sort_by='elapsed_s'):
+    """
+    Splits 'estimates' (DataFrame indexed by exp_id) into at most 'n_groups' groups of
+    similar resource demand.
+    Returns list of DataFrames, ordered by increasing demand.
+    """
+    estimates_sorted = estimates.sort_values(by=sort_by)
+    n_groups = max(1, min(n_groups, len(estimates_sorted)))
+    chunks = np.array_split(np.arange(len(estimates_sorted)), n_groups)
+    groups = [estimates_sorted.iloc[chunk] for chunk in chunks if len(chunk) > 0]
+    return groups
@@ -1,7 +1,14 @@
 import subprocess, shlex
+import itertools
 import socket
+import numpy as np
 import pandas as pd
 
+final_job_states = ['COMPLETED', 'FAILED', 'TIMEOUT', 'OUT_OF_MEMORY', 'CANCELLED', 'NODE_FAIL',
+                    'PREEMPTED', 'BOOT_FAIL', 'DEADLINE']
+# tasks in these states may succeed when resubmitted; 'CANCELLED' is excluded as it is usually intended
+failed_job_states = ['FAILED', 'TIMEOUT', 'OUT_OF_MEMORY', 'NODE_FAIL', 'PREEMPTED', 'BOOT_FAIL', 'DEADLINE']
+
 def replaceTextInFile(replacement_dict, path_to_input_file, path_to_output_file):
     with open(path_to_input_file) as infile, open(path_to_output_file, 'w') as outfile:
         for line in infile:
@@ -22,7 +29,7 @@ def submit_job(path_to_job_file, expected_hostname='submit'):
     else:
         can_submit = hostname.startswith(expected_hostname)
     if can_submit:
-        output = subprocess.check_output(['sbatch', path_to_job_file])
+        output = subprocess.check_output(['sbatch', path_to_job_file], universal_newlines=True)
         job_id = output.split()[3]
     else:
         print("Cannot submit job on host '%s'" % hostname)
@@ -30,10 +37,10 @@ def submit_job(path_to_job_file, expected_hostname='submit'):
     print("Submitted file '%s' as job '%s'" % (path_to_job_file, job_id))
     return job_id
 
-def cml_output_to_pandas(output, header=None):
-    table = [line.strip().split() for line in output]
+def cml_output_to_pandas(output, header=None, delimiter=None):
+    table = [line.strip().split(delimiter) for line in output if line.strip()]
     if header == None:
-        header = map(str.lower, table.pop(0))
+        header = [name.lower() for name in table.pop(0)]
     if not len(table) == 0:
         if len(table[0]) > 0:
             table_pd = pd.DataFrame(table, columns=header).dropna(axis=0)
@@ -61,16 +68,123 @@ def check_job_jobid_running(job_id):
         print("Process id='%s' seems to have finished." % str(job_id))
         return {'JobState': 'invalid'}
 
-def check_jobs_past(start_time, end_time=None):
-    if end_time is None:
-        command_string = 'sacct --starttime=%s' % str(start_time.date())
-    else:
-        command_string = 'sacct --starttime=%s --endtime=%s' % str(start_time.date(), end_time.date())
+def check_jobs_past(start_time=None, end_time=None, job_ids=None, format_fields=None):
+    """
+    Queries slurm accounting (sacct).
+    If 'format_fields' are given, output is requested in parsable form ('|' delimited) and
+    job steps are kept, e.g. to extract 'MaxRSS' which is only reported for steps.
+    """
+    command_string = 'sacct'
+    if start_time is not None:
+        command_string += ' --starttime=%s' % str(start_time.date())
+    if end_time is not None:
+        command_string += ' --endtime=%s' % str(end_time.date())
+    if job_ids is not None:
+        if isinstance(job_ids, (list, tuple)):
+            job_ids = ",".join([str(job_id) for job_id in job_ids])
+        command_string += ' --jobs=%s' % str(job_ids)
+    if format_fields is not None:
+        command_string += ' --parsable2 --format=%s' % ",".join(format_fields)
     args = shlex.split(command_string)
     try:
-        output = subprocess.check_output(args).split('\n')
-        output_filtered = [line for line in output if not '.ba+' in line]
-        table_pd = cml_output_to_pandas(output_filtered)
+        output = subprocess.check_output(args, universal_newlines=True).split('\n')
+        if format_fields is None:
+            output_filtered = [line for line in output if not '.ba+' in line]
+            table_pd = cml_output_to_pandas(output_filtered)
+        else:
+            table_pd = cml_output_to_pandas(output, delimiter='|')
         return table_pd
     except:
         print("Cannot process output'")
+
+def slurm_time_to_seconds(time_str):
+    """
+    Converts slurm time strings '[DD-[HH:]]MM:SS[.sss]' to seconds.
+    """
+    time_str = str(time_str).strip()
+    if time_str in ['', 'nan', 'None', 'UNLIMITED', 'INVALID', 'Partition_Limit']:
+        return np.nan
+    days = 0
+    if '-' in time_str:
+        days_str, time_str = time_str.split('-', 1)
+        days = int(days_str)
+    parts = [float(part) for part in time_str.split(':')]
+    seconds = 0.
+    for part in parts:
+        seconds = seconds * 60 + part
+    return days * 86400 + seconds
+
+def seconds_to_slurm_time(seconds):
+    """
+    Converts seconds to slurm time string 'DD-HH:MM:SS', rounding up to full minutes.
+    """
+    minutes = int(np.ceil(seconds / 60.))
+    days, minutes = divmod(minutes, 24 * 60)
+    hours, minutes = divmod(minutes, 60)
+    if days > 0:
+        return "%i-%02i:%02i:00" % (days, hours, minutes)
+    else:
+        return "%02i:%02i:00" % (hours, minutes)
+
+def slurm_memory_to_mb(memory_str):
+    """
+    Converts slurm memory strings such as '2048K', '512M', '5G' to MB.
+    Values without unit are interpreted as bytes (as reported for MaxRSS).
+    """
+    memory_str = str(memory_str).strip()
+    if memory_str in ['', 'nan', 'None']:
+        return np.nan
+    # ReqMem may carry suffix 'n' (per node) or 'c' (per cpu)
+    if memory_str[-1] in ['n', 'c']:
+        memory_str = memory_str[:-1]
+    factors = {'K': 1. / 1024, 'M': 1., 'G': 1024., 'T': 1024. ** 2}
+    if memory_str[-1].upper() in factors.keys():
+        return float(memory_str[:-1]) * factors[memory_str[-1].upper()]
+    else:
+        return float(memory_str) / 1024. ** 2
+
+def mb_to_slurm_memory(memory_mb):
+    """
+    Converts memory in MB to slurm memory string, rounding up to full MB.
+    """
+    return "%iM" % int(np.ceil(memory_mb))
+
+def indices_to_array_range(indices):
+    """
+    Compresses list of integer indices into slurm array range string, e.g. [1,2,3,7] -> '1-3,7'.
+    """
+    indices = sorted(set([int(index) for index in indices]))
+    range_strs = []
+    for _, group in itertools.groupby(enumerate(indices), lambda item: item[1] - item[0]):
+        group = [index for _, index in group]
+        if len(group) > 1:
+            range_strs.append("%i-%i" % (group[0], group[-1]))
+        else:
+            range_strs.append("%i" % group[0])
+    return ",".join(range_strs)
+
+def array_range_to_indices(array_range):
+    """
+    Expands slurm array range string into list of integer indices, e.g. '1-3,7%2' -> [1,2,3,7].
+    """
+    array_range = str(array_range).strip('[]').split('%')[0]
+    indices = []
+    for range_str in array_range.split(','):
+        if '-' in range_str:
+            start, end = range_str.split('-')
+            indices.extend(range(int(start), int(end) + 1))
+        elif range_str.isdigit():
+            indices.append(int(range_str))
+    return indices
+
+def parse_array_job_id(job_id_str):
+    """
+    Splits sacct job ids of array tasks, e.g. '1234_5.batch' -> ('1234', [5], 'batch').
+    Pending tasks may be reported jointly, e.g. '1234_[5-7]' -> ('1234', [5, 6, 7], '').
+    Returns empty list of task indices if the id does not identify array tasks.
+    """
+    job_id_str = str(job_id_str)
+    job_id_str, _, step = job_id_str.partition('.')
+    job_id, _, task_str = job_id_str.partition('_')
+    task_ids = array_range_to_indices(task_str)
+    return job_id, task_ids, step
@@ -0,0 +1,303 @@
+"""Catalog of parametric studies, indexing parameter and results tables of multiple studies in one SQLite file"""
+
+import os
+import pathlib as pl
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from pasty.parametric_study import get_default_config
+
+
+class StudyCatalog():
+
+    def __init__(self, path_to_db, significant_digits=12):
+        """
+        Parameter and results tables of registered studies are stored in long format
+        (study_id, exp_id, name, value), so that studies with different parameters share the same tables.
+        Queries operate on this store only; study states ('experiment_state.pkl') are never loaded.
+        Float parameter values, and parameter values in queries, are rounded to 'significant_digits',
+        so that values generated by np.arange / np.linspace compare equal to their nominal values.
+        """
+        self.significant_digits = significant_digits
+        self.path_to_db = pl.Path(path_to_db)
+        self.path_to_db.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(self.path_to_db.as_posix())
+        self._create_tables()
+
+    def _create_tables(self):
+        with self.connection:
+            self.connection.executescript("""
+                CREATE TABLE IF NOT EXISTS studies (study_id INTEGER PRIMARY KEY, name TEXT UNIQUE,
+                                                    base_dir TEXT UNIQUE, registration_time TEXT,
+                                                    parameter_table_path TEXT, results_table_path TEXT,
+                                                    parameter_table_mtime REAL, results_table_mtime REAL);
+                CREATE TABLE IF NOT EXISTS parameters (study_id INTEGER, exp_id INTEGER, name TEXT, value);
+                CREATE TABLE IF NOT EXISTS results (study_id INTEGER, exp_id INTEGER, entry INTEGER,
+                                                    name TEXT, value);
+                CREATE INDEX IF NOT EXISTS parameters_name_value ON parameters (name, value);
+                CREATE INDEX IF NOT EXISTS parameters_study_exp ON parameters (study_id, exp_id);
+                CREATE INDEX IF NOT EXISTS results_name_value ON results (name, value);
+                CREATE INDEX IF NOT EXISTS results_study_exp ON results (study_id, exp_id);
+                """)
+
+    def close(self):
+        self.connection.close()
+
+    def _table_paths(self, base_dir, config=None):
+        study_config = get_default_config(base_dir)
+        if config:
+            study_config.update(config)
+        p_analysis = pl.Path(base_dir).joinpath(study_config['analysis_dir'])
+        p_parameter_table = p_analysis.joinpath(study_config['parameter_table_file_name'] + '.pkl')
+        p_results_table = p_analysis.joinpath(study_config['results_table_file_name'] + '.pkl')
+        return p_parameter_table, p_results_table
+
+    def _get_mtime(self, path):
+        try:
+            return path.stat().st_mtime
+        except OSError:
+            return None
+
+    def register(self, base_dir, name=None, config=None, verbose=False):
+        """
+        Registers study in 'base_dir' and indexes its parameter and results tables, as saved in the
+        study's analysis directory; 'config' gives the study's non-default directory or file names.
+        If the study is already registered, tables are only re-indexed if their files have changed,
+        using the table locations stored at registration unless 'config' is given.
+        Studies are named by their directory name unless 'name' is given; if this name is taken by
+        another study, the full 'base_dir' is used.
+        Returns study_id.
+        """
+        base_dir = pl.Path(base_dir).resolve().as_posix()
+        row = self.connection.execute("SELECT study_id, parameter_table_path, results_table_path, "
+                                      "parameter_table_mtime, results_table_mtime "
+                                      "FROM studies WHERE base_dir = ?", (base_dir,)).fetchone()
+        if row is not None and config is None and row[1] is not None:
+            p_parameter_table, p_results_table = pl.Path(row[1]), pl.Path(row[2])
+        else:
+            p_parameter_table, p_results_table = self._table_paths(base_dir, config)
+        if not p_parameter_table.exists():
+            print("-- Cannot register study in '%s': parameter table '%s' missing" % (base_dir, p_parameter_table))
+            return None
+        if row is None:
+            if name is None:
+                name = pl.Path(base_dir).name
+                if self.connection.execute("SELECT 1 FROM studies WHERE name = ?", (name,)).fetchone():
+                    name = base_dir
+            elif self.connection.execute("SELECT 1 FROM studies WHERE name = ?", (name,)).fetchone():
+                print("-- Cannot register study in '%s': name '%s' is used by another study" % (base_dir, name))
+                return None
+        with self.connection:
+            if row is None:
+                cursor = self.connection.execute("INSERT INTO studies (name, base_dir, registration_time) "
+                                                 "VALUES (?, ?, ?)",
+                                                 (name, base_dir, datetime.now().isoformat()))
+                study_id, parameter_mtime, results_mtime = cursor.lastrowid, None, None
+                print("-- Registering study '%s' from '%s'" % (name, base_dir))
+            else:
+                study_id, _, _, parameter_mtime, results_mtime = row
+            self.connection.execute("UPDATE studies SET parameter_table_path = ?, results_table_path = ? "
+                                    "WHERE study_id = ?",
+                                    (p_parameter_table.as_posix(), p_results_table.as_posix(), study_id))
+            # -- parameters
+            mtime = self._get_mtime(p_parameter_table)
+            if mtime != parameter_mtime:
+                if verbose:
+                    print("  - indexing parameter table '%s'" % p_parameter_table)
+                param_df = pd.read_pickle(p_parameter_table.as_posix())
+                param_df = param_df.drop('simulation_path', axis=1, errors='ignore')
+                self._insert_table('parameters', study_id, param_df)
+                self.connection.execute("UPDATE studies SET parameter_table_mtime = ? WHERE study_id = ?",
+                                        (mtime, study_id))
+            # -- results
+            mtime = self._get_mtime(p_results_table)
+            if mtime is not None and mtime != results_mtime:
+                if verbose:
+                    print("  - indexing results table '%s'" % p_results_table)
+                results_df = pd.read_pickle(p_results_table.as_posix())
+                results_df = results_df.drop('sim_name', axis=1, errors='ignore')
+                self._insert_table('results', study_id, results_df)
+                self.connection.execute("UPDATE studies SET results_table_mtime = ? WHERE study_id = ?",
+                                        (mtime, study_id))
+        return study_id
+
+    def _insert_table(self, table_name, study_id, dataframe):
+        """
+        Replaces entries of 'study_id' in 'table_name' by the scalar values of 'dataframe'.
+        The index of 'dataframe' is interpreted as exp_id.
+        """
+        self.connection.execute("DELETE FROM %s WHERE study_id = ?" % table_name, (study_id,))
+        exp_ids = [int(exp_id) for exp_id in dataframe.index]
+        entries = pd.Series(exp_ids).groupby(exp_ids).cumcount().tolist()
+        rows = []
+        significant_digits = self.significant_digits if table_name == 'parameters' else None
+        for name in dataframe.columns:
+            for exp_id, entry, value in zip(exp_ids, entries, dataframe[name].tolist()):
+                value = self._to_sql_value(value, significant_digits)
+                if value is not None:
+                    if table_name == 'results':
+                        rows.append((study_id, exp_id, entry, str(name), value))
+                    else:
+                        rows.append((study_id, exp_id, str(name), value))
+        placeholders = ", ".join(["?"] * (5 if table_name == 'results' else 4))
+        self.connection.executemany("INSERT INTO %s VALUES (%s)" % (table_name, placeholders), rows)
+
+    def _to_sql_value(self, value, significant_digits=None):
+        """
+        Converts scalar values to types supported by sqlite, returns None for missing or non-scalar values.
+        Floats are rounded to 'significant_digits' if given.
+        """
+        if isinstance(value, (bool, np.bool_)):
+            return int(value)
+        elif isinstance(value, (int, np.integer)):
+            return int(value)
+        elif isinstance(value, (float, np.floating)):
+            if np.isnan(value):
+                return None
+            elif significant_digits is not None:
+                return float('%.*g' % (significant_digits, value))
+            else:
+                return float(value)
+        elif isinstance(value, str):
+            return value
+        else:
+            return None
+
+    def update(self, verbose=False):
+        """
+        Re-indexes all registered studies whose tables have changed, using the table locations
+        stored at registration.
+        """
+        for study_id, base_dir in self.connection.execute("SELECT study_id, base_dir FROM studies").fetchall():
+            if os.path.isdir(base_dir):
+                self.register(base_dir, verbose=verbose)
+            else:
+                print("-- Study directory '%s' not found" % base_dir)
+
+    def unregister(self, study):
+        study_id = self.get_study_id(study)
+        with self.connection:
+            for table_name in ['parameters', 'results', 'studies']:
+                self.connection.execute("DELETE FROM %s WHERE study_id = ?" % table_name, (study_id,))
+
+    def get_study_id(self, study):
+        """
+        Returns study_id for study name, base_dir (str or path) or study_id.
+        """
+        if isinstance(study, (int, np.integer)):
+            row = self.connection.execute("SELECT study_id FROM studies WHERE study_id = ?",
+                                          (int(study),)).fetchone()
+        else:
+            base_dir = pl.Path(study).resolve().as_posix()
+            row = self.connection.execute("SELECT study_id FROM studies WHERE name = ? OR base_dir = ?",
+                                          (str(study), base_dir)).fetchone()
+        if row is None:
+            raise KeyError("Study '%s' is not registered" % study)
+        return row[0]
+
+    def list_studies(self):
+        return pd.read_sql_query("SELECT * FROM studies", self.connection, index_col='study_id')
+
+    def query(self, parameter_ranges=None, studies=None, results=None):
+        """
+        Returns configurations of all (or selected) studies that satisfy 'parameter_ranges', with
+        their parameters and (selected) results, one row per study and exp_id.
+
+        'parameter_ranges' maps parameter names to (min, max) tuples, lists of admissible values,
+        or single values, e.g. {"D_WM": (0.05, 0.1), "coupling": [0.02, 0.12]}.
+        'results' is a list of result names to include, all results are included if 'results' is True.
+        """
+        conditions = []
+        args = []
+        for name, spec in (parameter_ranges or {}).items():
+            if isinstance(spec, tuple):
+                conditions.append("(name = ? AND value BETWEEN ? AND ?)")
+                args.extend([name, spec[0], spec[1]])
+            elif isinstance(spec, (list, np.ndarray)):
+                conditions.append("(name = ? AND value IN (%s))" % ", ".join(["?"] * len(spec)))
+                args.extend([name] + [self._to_sql_value(value, self.significant_digits) for value in spec])
+            else:
+                conditions.append("(name = ? AND value = ?)")
+                args.extend([name, self._to_sql_value(spec, self.significant_digits)])
+        study_filter = ""
+        if studies is not None:
+            study_ids = [self.get_study_id(study) for study in studies]
+            study_filter = "study_id IN (%s)" % ", ".join(["%i" % study_id for study_id in study_ids])
+        if len(conditions) > 0:
+            where = " OR ".join(conditions)
+            if study_filter:
+                where = "(%s) AND %s" % (where, study_filter)
+            selection = ("SELECT study_id, exp_id FROM parameters WHERE %s GROUP BY study_id, exp_id "
+                         "HAVING COUNT(*) = %i" % (where, len(conditions)))
+        else:
+            selection = "SELECT DISTINCT study_id, exp_id FROM parameters"
+            if study_filter:
+                selection += " WHERE " + study_filter
+        sql = ("SELECT p.study_id, p.exp_id, p.name, p.value FROM parameters p "
+               "JOIN (%s) s ON p.study_id = s.study_id AND p.exp_id = s.exp_id" % selection)
+        params_long = pd.read_sql_query(sql, self.connection, params=args)
+        table = self._to_wide(params_long)
+        if results and len(table) > 0:
+            sql = ("SELECT r.study_id, r.exp_id, r.entry, r.name, r.value FROM results r "
+                   "JOIN (%s) s ON r.study_id = s.study_id AND r.exp_id = s.exp_id" % selection)
+            sql_args = list(args)
+            if results is not True:
+                sql += " WHERE r.name IN (%s)" % ", ".join(["?"] * len(results))
+                sql_args.extend(results)
+            results_long = pd.read_sql_query(sql, self.connection, params=sql_args)
+            results_wide = self._to_wide(results_long, index=['study_id', 'exp_id', 'entry'])
+            table = table.merge(results_wide, on=['study_id', 'exp_id'], how='left')
+            if (table.entry.fillna(0) == 0).all():
+                table = table.drop('entry', axis=1)
+        return self._add_study_names(table)
+
+    def _to_wide(self, table_long, index=['study_id', 'exp_id']):
+        if len(table_long) == 0:
+            return pd.DataFrame(columns=index)
+        table = table_long.pivot_table(index=index, columns='name', values='value', aggfunc='first')
+        table.columns.name = None
+        return table.reset_index()
+
+    def _add_study_names(self, table):
+        names = self.list_studies().name
+        table.insert(1, 'study', table.study_id.map(names))
+        return table
+
+    def match_parameter_sets(self, studies, param_names=None, results=None, decimals=10):
+        """
+        Joins configurations of 'studies' that have identical values for 'param_names'
+        (default: parameters common to all studies).
+        Returns one row per matching parameter set, with exp_id (and selected results) of each study.
+        """
+        tables = []
+        for study in studies:
+            table = self.query(studies=[study], results=results)
+            tables.append(table.drop(['study_id', 'study'], axis=1))
+        if param_names is None:
+            param_sets = [set(self._parameter_names(study)) for study in studies]
+            param_names = sorted(set.intersection(*param_sets))
+        merged = None
+        for study, table in zip(studies, tables):
+            table = table.copy()
+            for name in param_names:
+                # columns of studies with non-numeric parameters are of object dtype after pivoting
+                try:
+                    table[name] = pd.to_numeric(table[name]).round(decimals)
+                except (ValueError, TypeError):
+                    pass
+            other_cols = [col for col in table.columns if col not in param_names]
+            table = table[param_names + other_cols].rename(columns={col: "%s_%s" % (col, study)
+                                                                     for col in other_cols})
+            if merged is None:
+                merged = table
+            else:
+                merged = merged.merge(table, on=param_names, how='inner')
+        return merged
+
+    def _parameter_names(self, study):
+        rows = self.connection.execute("SELECT DISTINCT name FROM parameters WHERE study_id = ?",
+                                       (self.get_study_id(study),)).fetchall()
+        return [row[0] for row in rows]
@@ -0,0 +1,14 @@
+import os
+from pasty.study_catalog import StudyCatalog
+from pasty import config
+
+catalog = StudyCatalog(os.path.join(config.output_dir, 'study_catalog.sqlite'))
+catalog.register(config.test_folder_structure_dir, verbose=True)
+print(catalog.list_studies())
+
+# configurations of all studies within parameter ranges, with selected results
+selection = catalog.query({"D_WM": (0.05, 0.10), "coupling": [0.02, 0.06]}, results=True)
+print(selection)
+
+# configurations with identical parameters in different studies
+# matches = catalog.match_parameter_sets(['study_1', 'study_2'], results=['relative_error_D_WM'])
@@ -13,6 +13,7 @@ max_cpu_time = "10:00:00"
 path_singularity = '/singularity/fenics'
 
 replacement_dict = {'VAR_MAX_CPU_TIME' : max_cpu_time,
+                    'VAR_MEM_PER_CPU' : '5G',
                     'VAR_PATH_CODE_MAIN' : path_glimslib,
                     'VAR_PATH_CODE_EXPERIMENT' : path_code_experiment,
                     'VAR_PATH_SINGULARITY_IMAGE' : path_singularity,
@@ -11,6 +11,7 @@ max_cpu_time = "10:00:00"
 path_singularity = '/singularity/fenics'
 
 replacement_dict = {'VAR_MAX_CPU_TIME' : '10:00:00',
+                    'VAR_MEM_PER_CPU' : '5G',
                     'VAR_SUBMISSION_NAME' : job_name,
                     'VAR_JOB_ARRAY_RANGE' : '1-10',
                     'VAR_SLURM_ERROR_OUT' : os.path.join(experiment_base_dir, 'slurm_output_error.out'),
@@ -7,7 +7,7 @@
 #SBATCH --mail-type=end,fail
 #--- Mandatory resources (h_cpu=hh:mm:ss)
 #SBATCH --cpus-per-task=1
-#SBATCH --mem-per-cpu=5G
+#SBATCH --mem-per-cpu=VAR_MEM_PER_CPU
 #SBATCH --tmp=2G
 #SBATCH --time=VAR_MAX_CPU_TIME
 #--- JOB
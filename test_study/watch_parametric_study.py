@@ -0,0 +1,14 @@
+from pasty.parametric_study import ParametricStudy
+from pasty import config
+
+replacement_dict = {'VAR_MAX_CPU_TIME' : "10:00:00",
+                    'VAR_MEM_PER_CPU' : '5G',
+                    'VAR_PATH_CODE_MAIN' : '/glimslib',
+                    'VAR_PATH_CODE_EXPERIMENT' : '/code',
+                    'VAR_PATH_SINGULARITY_IMAGE' : '/singularity/fenics',
+}
+
+ps = ParametricStudy(config.test_folder_structure_dir)
+ps.reload_state()
+ps.watch(config.path_to_slurm_test_template, job_params=replacement_dict,
+         poll_interval=600, max_retries=2, verbose=False)